@@ -8,14 +8,28 @@ This FastAPI application provides endpoints for:
 
 Intended for use in analyzing and modeling museum attendance data.
 """
+import sys
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
 
-from src.etl.pipeline import run_etl
-from src.ml.features import load_features
-from src.ml.model import fit_linear_regression
+# The ETL, database and ML modules pull in SQLAlchemy, pandas, numpy and
+# sklearn; they are imported inside the handlers that need them so that
+# startup and /healthz do not pay for them.
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Close the pooled HTTP client opened on the server's event loop at shutdown."""
+    yield
+    http = sys.modules.get("src.clients._http")
+    if http is not None:
+        await http.aclose_client()
 
-app = FastAPI(title="Museum Attendance API", version="0.1.0")
+
+app = FastAPI(title="Museum Attendance API", version="0.1.0", lifespan=lifespan)
 
 
 class Health(BaseModel):
@@ -35,29 +49,42 @@ def healthcheck() -> Health:
 
 
 @app.post("/etl/run", response_model=ETLResponse)
-def trigger_etl():
-    """Trigger the ETL pipeline to fetch and process museum data."""
+async def trigger_etl():
+    """Trigger the ETL pipeline to fetch and process museum data.
+
+    Runs on the server's event loop, so concurrent runs share its pooled HTTP
+    client instead of each starting a loop in a worker thread; the pipeline
+    moves its database writes and HTML parsing to worker threads.
+    """
+    from src.etl.pipeline import run_etl_async
+
     try:
-        result = run_etl()
+        result = await run_etl_async()
         return ETLResponse(**result)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e)) from e
 
 
-@app.get("/features")
+@app.get("/features", response_class=ORJSONResponse)
 def get_features():
-    """Get the merged dataset of museums, cities, and populations."""
+    """Get the merged dataset of museums, cities, and populations.
+
+    Each row is a list of values in the order given by `columns`.
+    """
+    from src.ml.features import load_features
+
     try:
         df = load_features()
 
-        # Convert DataFrame to list of rows
-        rows = df.to_dict('records') if not df.empty else []
+        # values.tolist() converts to native Python types in one C pass, and
+        # orjson encodes the nested lists without building a dict per row
+        rows = df.values.tolist()
 
-        return {
+        return ORJSONResponse({
             "columns": df.columns.tolist(),
             "rows": rows,
             "count": len(rows)
-        }
+        })
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e)) from e
 
@@ -65,6 +92,10 @@ def get_features():
 @app.get("/model/linear")
 def model_linear():
     """Run linear regression on museum visitors vs city population."""
+    import numpy as np
+    from src.ml.features import load_features
+    from src.ml.model import fit_simple_linear_regression
+
     try:
         df = load_features()
 
@@ -78,12 +109,12 @@ def model_linear():
                 "notes": "No data available. Run ETL first."
             }
 
-        # Prepare features for regression
-        X = df[['population']].values
-        y = df['visitors'].values
+        # Prepare features for regression (views, not copies, when already float64)
+        x = df['population'].to_numpy(dtype=np.float64, copy=False)
+        y = df['visitors'].to_numpy(dtype=np.float64, copy=False)
 
-        # Fit the model
-        result = fit_linear_regression(X, y)
+        # Fit the model (single feature, so solve OLS in closed form)
+        result = fit_simple_linear_regression(x, y)
 
         return {
             "model": "linear_regression",
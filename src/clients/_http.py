@@ -0,0 +1,27 @@
+"""Pooled HTTP client shared by the Wikipedia and Wikidata clients."""
+import asyncio
+import weakref
+import httpx
+
+# One pooled client per event loop: httpx connections are bound to the loop
+# that opened them, and run_etl starts a fresh loop on every call. Both API
+# clients draw from the same pool, so one ETL run keeps a single set of
+# connections open.
+_CLIENTS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+
+
+def get_client() -> httpx.AsyncClient:
+    """Return the shared HTTP client for the running event loop, creating it on first use."""
+    loop = asyncio.get_running_loop()
+    client = _CLIENTS.get(loop)
+    if client is None:
+        client = httpx.AsyncClient(timeout=30, limits=httpx.Limits(max_connections=20, max_keepalive_connections=20))
+        _CLIENTS[loop] = client
+    return client
+
+
+async def aclose_client() -> None:
+    """Close the shared HTTP client of the running event loop, if one was opened."""
+    client = _CLIENTS.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
@@ -1,9 +1,59 @@
 """Wikidata client for fetching city population data."""
-from typing import Dict, Any, Optional
-import httpx
+import threading
+from typing import Dict, Any, List, Optional
+import orjson
+from cachetools import TTLCache
+from src.clients._http import get_client
 from src.core.config import settings
 from src.core.logging import logger
 
+# Decoded SPARQL responses keyed by query string. Labels and populations change
+# on a scale of days, so repeated ETL runs can skip the network entirely. The
+# lock is a threading.Lock because concurrent ETL runs use separate event loops.
+_SPARQL_CACHE: TTLCache = TTLCache(maxsize=512, ttl=max(settings.sparql_cache_ttl, 1))
+_SPARQL_CACHE_LOCK = threading.Lock()
+
+
+async def _execute_sparql_query(query: str) -> Dict[str, Any]:
+    """Run a SPARQL query against Wikidata and return the decoded JSON response.
+
+    Responses are cached for `settings.sparql_cache_ttl` seconds; set
+    SPARQL_CACHE_TTL=0 to always hit the endpoint.
+    """
+    use_cache = settings.sparql_cache_ttl > 0
+    if use_cache:
+        with _SPARQL_CACHE_LOCK:
+            cached = _SPARQL_CACHE.get(query)
+        if cached is not None:
+            return cached
+
+    client = get_client()
+    resp = await client.get(
+        settings.wikidata_endpoint,
+        params={"query": query, "format": "json"}
+    )
+    resp.raise_for_status()
+    data = orjson.loads(resp.content)
+
+    if use_cache:
+        with _SPARQL_CACHE_LOCK:
+            _SPARQL_CACHE[query] = data
+    return data
+
+
+def _bindings(data: Dict[str, Any]) -> list:
+    """Return the result rows of a SPARQL JSON response, or [] if it has none."""
+    try:
+        return data["results"]["bindings"]
+    except KeyError:
+        return []
+
+
+def _binding_value(binding: Dict[str, Any], key: str, default: Any) -> Any:
+    """Return the value bound to `key` in a SPARQL result row, or `default` if unbound."""
+    cell = binding.get(key)
+    return cell["value"] if cell else default
+
 
 async def fetch_city_population(wikidata_qid: str) -> Dict[str, Any]:
     """Fetch city population from Wikidata using SPARQL.
@@ -52,22 +102,16 @@ async def fetch_city_population(wikidata_qid: str) -> Dict[str, Any]:
         LIMIT 1
         """
 
-        async with httpx.AsyncClient(timeout=30) as client:
-            resp = await client.get(
-                settings.wikidata_endpoint,
-                params={"query": query, "format": "json"}
-            )
-            resp.raise_for_status()
-            data = resp.json()
-
-            bindings = data.get("results", {}).get("bindings", [])
-            if bindings:
-                result = bindings[0]
-                return {
-                    "population": int(result.get("population", {}).get("value", 0)),
-                    "city_name": result.get("cityName", {}).get("value", ""),
-                    "wikidata_id": wikidata_qid
-                }
+        data = await _execute_sparql_query(query)
+
+        bindings = _bindings(data)
+        if bindings:
+            result = bindings[0]
+            return {
+                "population": int(_binding_value(result, "population", 0)),
+                "city_name": _binding_value(result, "cityName", ""),
+                "wikidata_id": wikidata_qid
+            }
 
     except Exception as e:
         logger.error(f"Error fetching population for {wikidata_qid}: {e}")
@@ -75,6 +119,47 @@ async def fetch_city_population(wikidata_qid: str) -> Dict[str, Any]:
     return {}
 
 
+async def fetch_city_populations_bulk(wikidata_qids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Fetch the latest population of several cities in one SPARQL query.
+
+    Returns a dict keyed by QID with the same fields as `fetch_city_population`;
+    cities without population data are left out.
+    """
+    populations: Dict[str, Dict[str, Any]] = {}
+    if not wikidata_qids:
+        return populations
+
+    try:
+        values = " ".join(f"wd:{qid}" for qid in sorted(set(wikidata_qids)))
+        query = f"""
+        SELECT ?city ?population ?pointInTime ?cityName WHERE {{
+          VALUES ?city {{ {values} }}
+          ?city rdfs:label ?cityName .
+          FILTER(LANG(?cityName) = "en")
+          ?city p:P1082 ?populationStatement .
+          ?populationStatement ps:P1082 ?population ;
+                             pq:P585 ?pointInTime .
+        }} ORDER BY ?city DESC(?pointInTime)
+        """
+
+        data = await _execute_sparql_query(query)
+
+        for result in _bindings(data):
+            qid = _binding_value(result, "city", "").split("/")[-1]
+            if qid in populations:
+                continue  # Rows are newest first per city, keep only the latest
+            populations[qid] = {
+                "population": int(_binding_value(result, "population", 0)),
+                "city_name": _binding_value(result, "cityName", ""),
+                "wikidata_id": qid
+            }
+
+    except Exception as e:
+        logger.error(f"Error fetching populations for {len(wikidata_qids)} cities: {e}")
+
+    return populations
+
+
 async def search_city_by_name(city_name: str) -> Optional[str]:
     """Search for a city's Wikidata QID by name.
     sample response from wikidata endpoint:
@@ -112,18 +197,12 @@ async def search_city_by_name(city_name: str) -> Optional[str]:
         LIMIT 1
         """
 
-        async with httpx.AsyncClient(timeout=30) as client:
-            resp = await client.get(
-                settings.wikidata_endpoint,
-                params={"query": query, "format": "json"}
-            )
-            resp.raise_for_status()
-            data = resp.json()
-
-            bindings = data.get("results", {}).get("bindings", [])
-            if bindings:
-                city_uri = bindings[0].get("city", {}).get("value", "")
-                return city_uri.split("/")[-1]  # Extract QID from URI
+        data = await _execute_sparql_query(query)
+
+        bindings = _bindings(data)
+        if bindings:
+            city_uri = _binding_value(bindings[0], "city", "")
+            return city_uri.split("/")[-1]  # Extract QID from URI
 
     except Exception as e:
         logger.error(f"Error searching for city {city_name}: {e}")
@@ -1,11 +1,40 @@
 """Wikipedia client for fetching museum data using the official Wikipedia API."""
+import asyncio
+import hashlib
+import threading
+from functools import lru_cache
 from typing import List, Dict, Any
-import httpx
+import orjson
 import re
-from bs4 import BeautifulSoup
+from cachetools import LRUCache
+from selectolax.lexbor import LexborHTMLParser
+from src.clients._http import get_client
 from src.core.config import settings
 from src.core.logging import logger
 
+# A visitor count with an optional unit word, e.g. "2.5 million" or "8,700,000";
+# searched for after parenthesised notes such as "(2019)" or "(est.)" are removed
+_VISITOR_RE = re.compile(r'(?P<num>[\d,]+(?:\.\d+)?)\s*(?P<unit>[a-zA-Z]+)?')
+_PARENTHESISED_RE = re.compile(r'\(.*?\)')
+# The year of the count, given in parentheses anywhere in the cell
+_YEAR_RE = re.compile(r'\((\d{4})\)')
+# Leftovers after HTML parsing, stripped in one pass: reference numbers like [1],
+# markdown-style flag images like ![](//upload.wikimedia.org/...), and quotes
+_POST_CLEAN_RE = re.compile(r'\[\d+\]|!\[.*?\]\([^)]+\)|"')
+_UNIT_MULTIPLIERS = {
+    'thousand': 1_000,
+    'k': 1_000,
+    'million': 1_000_000,
+    'mn': 1_000_000,
+    'm': 1_000_000,
+    'billion': 1_000_000_000,
+    'bn': 1_000_000_000,
+}
+
+# ETag and HTML of the last page fetch. The ETag is sent back as If-None-Match
+# so an unchanged page costs a 304 instead of a full download.
+_PAGE_CACHE: Dict[str, str] = {}
+
 
 async def fetch_most_visited_museums() -> List[Dict[str, Any]]:
     """Fetch museum data from Wikipedia's list of most visited museums using the official API."""
@@ -16,8 +45,8 @@ async def fetch_most_visited_museums() -> List[Dict[str, Any]]:
             logger.error("Failed to fetch Wikipedia page content")
             return []
 
-        # Parse the museum data from the page content
-        museums = _parse_museum_data_from_content(page_content)
+        # Parse the museum data from the page content, off the event loop
+        museums = await asyncio.to_thread(_parse_museum_data_from_content, page_content)
 
         logger.info(f"Successfully fetched {len(museums)} museums from Wikipedia API")
         return museums
@@ -30,55 +59,90 @@ async def fetch_most_visited_museums() -> List[Dict[str, Any]]:
 async def _fetch_wikipedia_page_content() -> str:
     """Fetch the Wikipedia page content using the official API."""
     try:
-        async with httpx.AsyncClient(timeout=30) as client:
-            # Use Wikipedia API to get page content
-            params = {
-                'action': 'parse',
-                'page': 'List_of_most-visited_museums',  # Correct page name with hyphen
-                'format': 'json',
-                'prop': 'text'
-            }
-
-            response = await client.get(settings.wikipedia_api_url, params=params)
-            response.raise_for_status()
-            data = response.json()
-
-            # Extract the HTML content from the API response
-            if 'parse' in data and 'text' in data['parse']:
-                return data['parse']['text']['*']
-
-            logger.error("No content found in Wikipedia API response")
-            return ""
+        client = get_client()
+        # Use Wikipedia API to get page content
+        params = {
+            'action': 'parse',
+            'page': 'List_of_most-visited_museums',  # Correct page name with hyphen
+            'format': 'json',
+            'prop': 'text',
+            # Drop the edit links, TOC and parser limit report we never read,
+            # shrinking the payload that has to be downloaded and decoded
+            'disableeditsection': 1,
+            'disabletoc': 1,
+            'disablelimitreport': 1
+        }
+
+        headers = {}
+        if 'etag' in _PAGE_CACHE:
+            headers['If-None-Match'] = _PAGE_CACHE['etag']
+
+        response = await client.get(settings.wikipedia_api_url, params=params, headers=headers)
+        if response.status_code == 304 and 'content' in _PAGE_CACHE:
+            logger.info("Wikipedia page not modified, reusing cached content")
+            return _PAGE_CACHE['content']
+
+        response.raise_for_status()
+        data = orjson.loads(response.content)
+
+        # Extract the HTML content from the API response
+        if 'parse' in data and 'text' in data['parse']:
+            content = data['parse']['text']['*']
+            etag = response.headers.get('etag')
+            if etag:
+                _PAGE_CACHE.update(etag=etag, content=content)
+            return content
+
+        logger.error("No content found in Wikipedia API response")
+        return ""
 
     except Exception as e:
         logger.error(f"Error fetching Wikipedia page via API: {e}")
         return ""
 
+# Parsed museum rows keyed by a digest of the page HTML, so re-runs against an
+# unchanged page (e.g. served from the ETag cache) skip the parse entirely
+_PARSE_CACHE: LRUCache = LRUCache(maxsize=8)
+_PARSE_CACHE_LOCK = threading.Lock()
+
 # TODO this is very specific to the wikipedia page, it should be more generic
 # e.g. make a factory pattern for different data sources
 def _parse_museum_data_from_content(html_content: str) -> List[Dict[str, Any]]:
-    """Parse museum data from Wikipedia HTML content using Beautiful Soup."""
+    """Parse museum data from Wikipedia HTML content, reusing the result for an unchanged page."""
+    key = hashlib.blake2b(html_content.encode(), digest_size=16).digest()
+    with _PARSE_CACHE_LOCK:
+        cached = _PARSE_CACHE.get(key)
+    if cached is None:
+        cached = _parse_museum_table(html_content)
+        with _PARSE_CACHE_LOCK:
+            _PARSE_CACHE[key] = cached
+    # Hand out copies so callers cannot alter the cached rows
+    return [dict(museum) for museum in cached]
+
+
+def _parse_museum_table(html_content: str) -> List[Dict[str, Any]]:
+    """Parse museum data from Wikipedia HTML content using the lexbor HTML parser."""
     museums = []
 
     try:
-        # Parse HTML with Beautiful Soup
-        soup = BeautifulSoup(html_content, 'html.parser')
+        # Parse HTML with selectolax (C-backed lexbor engine)
+        tree = LexborHTMLParser(html_content)
 
         # Find the table with museum data (look for wikitable class)
-        table = soup.find('table', class_='wikitable')
+        table = tree.css_first('table.wikitable')
         if not table:
             logger.warning("No wikitable found in Wikipedia content")
             return museums
 
         # Get all rows from tbody (skip thead)
-        tbody = table.find('tbody')
+        tbody = table.css_first('tbody')
         if not tbody:
             logger.warning("No tbody found in Wikipedia content")
             return museums
 
-        for row in tbody.find_all('tr'):
+        for row in tbody.css('tr'):
             # Get all cells (only td elements, ignore th)
-            cells = row.find_all('td')
+            cells = row.css('td')
 
             museum_data = _extract_museum_from_cells(cells)
             if museum_data:
@@ -90,127 +154,106 @@ def _parse_museum_data_from_content(html_content: str) -> List[Dict[str, Any]]:
     return museums
 
 
-def _is_valid_float(s: str) -> bool:
-    """Check if a string can be converted to a valid float"""
-    if not s:
-        return False
-    try:
-        float(s)
-        return True
-    except ValueError:
-        return False
-
-
 def _extract_visitor_count(visitor_cell: str) -> int:
     """Extract visitor count from a cell, handling various formats like '2.5 million', '8,700,000', etc."""
-    visitors = 0
+    return _parse_visitor_cell(visitor_cell)[0]
 
-    # Handle None or non-string input
-    if visitor_cell is None:
-        return 0
 
-    # Convert to string if not already
-    visitor_cell = str(visitor_cell)
+def _parse_visitor_cell(visitor_cell: str) -> tuple[int, int]:
+    """Extract the visitor count and the year in parentheses from a cell, e.g. '8,700,000 (2019)'.
 
-    # Remove (year) from visitor_cell, e.g., "8,700,000 (2019)" -> "8,700,000"
-    # This regex removes anything inside parentheses, including the parentheses themselves.
-    visitor_cell = re.sub(r'\(.*?\)', '', visitor_cell)
+    Either value is 0 when it cannot be found.
+    """
+    # Handle None or empty input
+    if not visitor_cell:
+        return 0, 0
 
-    # Try to find patterns like "2.5 million", "1 billion", etc.
-    text_number_pattern = r'([\d,]+\.?\d*)\s*([a-zA-Z]+)?'
-    text_match = re.search(text_number_pattern, visitor_cell, re.IGNORECASE)
+    visitor_cell = str(visitor_cell)
+    year_match = _YEAR_RE.search(visitor_cell)
+    year = int(year_match.group(1)) if year_match else 0
 
+    # Numbers inside parentheses (years, notes) are never the count
+    text_match = _VISITOR_RE.search(_PARENTHESISED_RE.sub('', visitor_cell))
     if not text_match:
         logger.debug(f"No text match found in visitor_cell: {visitor_cell}")
-        return 0
+        return 0, year
 
-    number_part = text_match.group(1).replace(',', '')
-    unit_part = text_match.group(2)  # Could be None or any text
+    number_part = text_match.group('num').replace(',', '')
+    unit_part = text_match.group('unit')  # Could be None or any text
 
-    # Check if the number part is a valid float (like Go's strconv.ParseFloat)
-    if not _is_valid_float(number_part):
+    try:
+        visitors = float(number_part)
+    except ValueError:
         logger.error(f"Invalid number format: '{number_part}'")
-        return 0
-
-    visitors = float(number_part)
-
-    if visitors < 0:
-        logger.debug(f"Negative number found in visitor_cell: {visitor_cell}")
-        return 0
+        return 0, year
 
     # Apply multiplication based on unit (or no multiplication if no unit)
     if not unit_part:
-        return int(visitors)
+        return int(visitors), year
+
+    unit = unit_part.lower()
+    multiplier = _UNIT_MULTIPLIERS.get(unit)
+    if multiplier is None:
+        logger.warning(f"Unknown unit: {unit}, using raw number")
+        return int(visitors), year
 
-    unit = unit_part.strip().lower()
-    if unit == 'thousand':
-        return int(visitors * 1_000)
-    if unit == 'million':
-        return int(visitors * 1_000_000)
-    if unit == 'billion':
-        return int(visitors * 1_000_000_000)
-    # Could add more units here as needed
+    return int(visitors * multiplier), year
 
-    logger.warning(f"Unknown unit: {unit}, using raw number")
-    return int(visitors)
 
 def clean_html(text: str) -> str:
     """Remove HTML tags, reference numbers, flag images, and clean up whitespace and quotes."""
     if not text:
         return ""
 
-    # Parse with Beautiful Soup to handle HTML properly
-    soup = BeautifulSoup(str(text), 'html.parser')
+    text = str(text)
+    # Cell text from the table parse is already tag-free: skip the HTML parser
+    if '<' not in text and '&' not in text:
+        return _POST_CLEAN_RE.sub('', text).strip()
 
-    # Remove reference numbers like [1], [2]
-    for ref in soup.find_all('sup', class_='reference'):
-        ref.decompose()
+    return _clean_html_cached(text)
 
-    # Remove flag images and other images
-    for img in soup.find_all('img'):
-        img.decompose()
 
-    # Get clean text
-    text = soup.get_text()
+# Memoizes the parse per distinct HTML string, for callers that pass raw
+# markup. The table parse passes node.text() output, which almost never
+# contains '<' or '&', so it takes the fast path above and rarely reaches this.
+@lru_cache(maxsize=4096)
+def _clean_html_cached(text: str) -> str:
+    """Memoized HTML path of clean_html; expects a non-empty string."""
+    # Parse with selectolax to handle HTML properly
+    tree = LexborHTMLParser(text)
 
-    # Remove reference numbers like [1], [2] (fallback for any remaining)
-    text = re.sub(r'\[\d+\]', '', text)
+    # Remove reference numbers like [1], [2] and flag images and other images
+    for node in tree.css('sup.reference, img'):
+        node.decompose()
 
-    # Remove markdown-style flag images like ![](//upload.wikimedia.org/...)
-    text = re.sub(r'!\[.*?\]\([^)]+\)', '', text)
+    # Get clean text
+    text = tree.body.text() if tree.body else ""
 
-    # Clean up whitespace and quotes
-    text = text.replace('"', '').strip()
-    return text
+    # Remove remaining reference numbers, flag images and quotes, then whitespace
+    return _POST_CLEAN_RE.sub('', text).strip()
 
 
 def _extract_museum_from_cells(cells) -> Dict[str, Any]:
-    """Extract museum data from Beautiful Soup table cells."""
+    """Extract museum data from selectolax table cell nodes."""
     if len(cells) < 4:  # Need at least museum name, visitors, city and country
         logger.warning(f"Missing essential data: only {len(cells)} cells provided, need 4")
         return None
 
     try:
         # Extract museum name (first cell)
-        museum_name = clean_html(cells[0].get_text())
-
-        # Extract visitor count (second cell)
-        visitor_cell = clean_html(cells[1].get_text())
-
-        # Look for year in parentheses (e.g., "1,324,000 (2023)")
-        year_match = re.search(r'\((\d{4})\)', visitor_cell)
-        year = int(year_match.group(1)) if year_match else 0
+        museum_name = clean_html(cells[0].text())
 
-        # Extract visitor count from the cell
-        visitors = _extract_visitor_count(visitor_cell)
+        # Extract visitor count and year (second cell, e.g. "1,324,000 (2023)")
+        visitor_cell = clean_html(cells[1].text())
+        visitors, year = _parse_visitor_cell(visitor_cell)
 
         if visitors < 2_000_000:
             logger.warning(f"Visitor count is less than 2,000,000: {visitors}")
             return None
 
         # Extract city (3rd column) and country (4th column)
-        city = clean_html(cells[2].get_text()).strip()
-        country = clean_html(cells[3].get_text()).strip()
+        city = clean_html(cells[2].text()).strip()
+        country = clean_html(cells[3].text()).strip()
 
         # Only return if we have essential data
         if not (museum_name and city and country):
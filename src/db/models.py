@@ -1,5 +1,5 @@
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
-from sqlalchemy import Integer, String, ForeignKey, UniqueConstraint
+from sqlalchemy import Index, Integer, String, ForeignKey, UniqueConstraint
 
 
 class Base(DeclarativeBase):
@@ -16,13 +16,19 @@ class City(Base):
     __tablename__ = "cities"
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     wikidata_id: Mapped[str | None] = mapped_column(String(32), index=True)
-    name: Mapped[str] = mapped_column(String(255), index=True)
+    name: Mapped[str] = mapped_column(String(255))
     country: Mapped[str | None] = mapped_column(String(255))
     population: Mapped[int | None] = mapped_column(Integer)
     last_updated: Mapped[str | None] = mapped_column(String(64))
 
     museums: Mapped[list["Museum"]] = relationship(back_populates="city")
 
+    # A unique index rather than a constraint so that ETL startup can add it to
+    # a cities table created before it existed (create_all skips existing tables)
+    __table_args__ = (
+        Index("uq_city_name_country", "name", "country", unique=True),
+    )
+
 
 class Museum(Base):
     """
@@ -31,7 +37,7 @@ class Museum(Base):
     __tablename__ = "museums"
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     wikidata_id: Mapped[str | None] = mapped_column(String(32), index=True)
-    name: Mapped[str] = mapped_column(String(255), index=True)
+    name: Mapped[str] = mapped_column(String(255))
     city_id: Mapped[int | None] = mapped_column(ForeignKey("cities.id"))
     last_updated: Mapped[str | None] = mapped_column(String(64))
 
@@ -50,7 +56,7 @@ class MuseumStat(Base):
     __tablename__ = "museum_stats"
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     museum_id: Mapped[int] = mapped_column(ForeignKey("museums.id"))
-    year: Mapped[int] = mapped_column(Integer, index=True)
+    year: Mapped[int] = mapped_column(Integer)
     visitors: Mapped[int] = mapped_column(Integer)
     last_updated: Mapped[str | None] = mapped_column(String(64))
 
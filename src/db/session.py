@@ -2,7 +2,18 @@ from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from src.core.config import settings
 
-engine = create_engine(settings.db_url, echo=False, future=True)
+# Pool sized for the concurrent ETL and API sessions; pre-ping drops connections
+# the server closed while idle, and the larger compiled cache keeps the bulk
+# upsert and feature statements from being recompiled
+engine = create_engine(
+    settings.db_url,
+    echo=False,
+    future=True,
+    pool_size=20,
+    max_overflow=10,
+    pool_pre_ping=True,
+    query_cache_size=1200,
+)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine, future=True)
 
 __all__ = ["engine", "SessionLocal"]
@@ -1,25 +1,53 @@
 """ETL pipeline for museum and city data."""
 import asyncio
+import sys
 from datetime import datetime
 from typing import Dict, Any, List
+from sqlalchemy import select, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session
 from src.core.logging import logger
 from src.db.session import SessionLocal, engine
 from src.db.models import Base, City, Museum, MuseumStat
+from src.clients._http import aclose_client
 from src.clients.wikipedia import fetch_most_visited_museums
-from src.clients.wikidata import fetch_city_population, search_city_by_name
+from src.clients.wikidata import fetch_city_populations_bulk, search_city_by_name
 
 
 def run_etl() -> dict:
-    """Run the complete ETL pipeline."""
+    """Run the complete ETL pipeline on a fresh event loop."""
+    return asyncio.run(_run_etl_and_close_client())
+
+
+async def _run_etl_and_close_client() -> dict:
+    """Run the ETL, then release pooled HTTP connections before asyncio.run closes the loop."""
+    try:
+        return await run_etl_async()
+    finally:
+        await aclose_client()
+
+
+async def run_etl_async() -> dict:
+    """Run the complete ETL pipeline on the running event loop.
+
+    Database work runs in worker threads so the loop keeps serving other
+    requests. The loop's pooled HTTP client is left open for other runs on
+    the same loop; whoever owns the loop closes it (the API does so at shutdown).
+    """
     logger.info("Starting ETL pipeline")
 
     try:
         # Create database tables
-        Base.metadata.create_all(bind=engine)
+        await asyncio.to_thread(_create_schema)
 
         # Run async ETL
-        result = asyncio.run(_run_async_etl())
+        result = await _extract_and_load()
+
+        # Features cached by the API are stale once new rows are written; the
+        # module is only loaded (and holding a cache) if features were served
+        features = sys.modules.get("src.ml.features")
+        if features is not None:
+            features.clear_features_cache()
 
         logger.info(f"ETL completed successfully: {result}")
         return result
@@ -29,8 +57,19 @@ def run_etl() -> dict:
         return {"status": "error", "error": str(e), "museums": 0, "cities": 0}
 
 
-async def _run_async_etl() -> dict:
-    """Run the async ETL operations."""
+def _create_schema() -> None:
+    """Create missing tables, and missing indexes on tables that already exist."""
+    Base.metadata.create_all(bind=engine)
+    # create_all leaves existing tables alone, so an index added to a model
+    # later (e.g. uq_city_name_country, which the city upsert's ON CONFLICT
+    # needs) is created here on databases that predate it
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+
+async def _extract_and_load() -> dict:
+    """Fetch museum and city data and write it to the database."""
     museums_processed = 0
     cities_processed = 0
 
@@ -50,28 +89,15 @@ async def _run_async_etl() -> dict:
     # Get city populations from Wikidata
     city_populations = await _fetch_city_populations_for_museums(museums_data)
 
-    # Process data in database
-    with SessionLocal() as db:
-        for museum_data in museums_data:
-            try:
-                # Create or get city
-                city = _get_or_create_city(db, museum_data, city_populations)
-                if city:
-                    cities_processed += 1
-
-                # Create museum
-                museum = _create_museum(db, museum_data, city)
-                if museum:
-                    museums_processed += 1
-
-                    # Create museum stats
-                    _create_museum_stats(db, museum, museum_data)
-
-            except Exception as e:
-                logger.error(f"Error processing museum {museum_data.get('name', 'Unknown')}: {e}")
-                continue
+    # Process data in database: one bulk upsert per table instead of a
+    # SELECT and flush per museum
+    city_ids, museum_ids = await asyncio.to_thread(_load, museums_data, city_populations)
 
-        db.commit()
+    for museum_data in museums_data:
+        if _city_key(museum_data) in city_ids:
+            cities_processed += 1
+        if _museum_key(museum_data, city_ids) in museum_ids:
+            museums_processed += 1
 
     return {
         "status": "ok",
@@ -80,21 +106,19 @@ async def _run_async_etl() -> dict:
     }
 
 
-def _get_or_create_city(db: Session, museum_data: Dict[str, Any], city_populations: Dict[str, Dict[str, Any]]) -> City | None:
-    """Get or create a city record."""
-    city_name = museum_data.get("city", "Unknown")
-    country = museum_data.get("country", "Unknown")
-
-    # Check if city already exists
-    existing_city = db.query(City).filter(
-        City.name == city_name,
-        City.country == country
-    ).first()
+def _load(museums_data: List[Dict[str, Any]], city_populations: Dict[str, Dict[str, Any]]) -> tuple[Dict[tuple, int], Dict[tuple, int]]:
+    """Write cities, museums and stats in one transaction; return the city and museum id maps."""
+    now_iso = datetime.now().isoformat()
+    with SessionLocal() as db:
+        city_ids = _upsert_cities(db, museums_data, city_populations, now_iso)
+        museum_ids = _upsert_museums(db, museums_data, city_ids, now_iso)
+        _insert_museum_stats(db, museums_data, city_ids, museum_ids, now_iso)
+        db.commit()
+    return city_ids, museum_ids
 
-    if existing_city:
-        return existing_city
 
-    # Get population data
+def _lookup_population(city_name: str, city_populations: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """Return the population data for a city, falling back to a partial name match."""
     population_data = city_populations.get(city_name, {})
     if not population_data:
         # Try partial matching for city names
@@ -103,84 +127,151 @@ def _get_or_create_city(db: Session, museum_data: Dict[str, Any], city_populatio
                 population_data = data
                 logger.info(f"Matched city '{city_name}' with '{key}' for population data")
                 break
+    return population_data
 
-    # Create new city with proper defaults
-    current_time = datetime.now().isoformat()
-    city = City(
-        name=city_name,
-        country=country,
-        population=population_data.get("population", 0) if population_data else 0,
-        wikidata_id=population_data.get("wikidata_id") if population_data else None,
-        last_updated=current_time
-    )
 
-    db.add(city)
-    db.flush()  # Get the ID
-    logger.info(f"Created city: {city_name}, {country}, population: {city.population}")
-    return city
+def _upsert_cities(db: Session, museums_data: List[Dict[str, Any]], city_populations: Dict[str, Dict[str, Any]], now_iso: str) -> Dict[tuple, int]:
+    """Insert the cities of all museums that are not stored yet.
 
+    Returns a {(name, country): id} map covering both new and existing cities.
+    """
+    city_keys = list(dict.fromkeys(_city_key(museum_data) for museum_data in museums_data))
 
-def _create_museum(db: Session, museum_data: Dict[str, Any], city: City | None) -> Museum | None:
-    """Create a museum record."""
-    try:
-        museum_name = museum_data.get("name", "Unknown")
-        city_id = city.id if city else None
-
-        # Check if museum already exists
-        existing_museum = db.query(Museum).filter(
-            Museum.name == museum_name,
-            Museum.city_id == city_id
-        ).first()
-
-        if existing_museum:
-            logger.debug(f"Museum {museum_name} already exists, skipping")
-            return existing_museum
-
-        current_time = datetime.now().isoformat()
-        museum = Museum(
-            name=museum_name,
-            city_id=city_id,
-            wikidata_id=None,  # Could be fetched from Wikidata
-            last_updated=current_time
-        )
-
-        db.add(museum)
-        db.flush()  # Get the ID
-        logger.info(f"Created museum: {museum.name} in city_id: {museum.city_id}")
-        return museum
+    rows = {}
+    for city_name, country in city_keys:
+        population_data = _lookup_population(city_name, city_populations)
+        rows[(city_name, country)] = {
+            "name": city_name,
+            "country": country,
+            "population": population_data.get("population", 0) if population_data else 0,
+            "wikidata_id": population_data.get("wikidata_id") if population_data else None,
+            "last_updated": now_iso
+        }
 
-    except Exception as e:
-        logger.error(f"Error creating museum: {e}")
-        db.rollback()  # Rollback on error
-        return None
+    # Existing cities keep their stored population, as before
+    return _get_or_insert_ids(db, City, ("name", "country"), rows)
 
 
-def _create_museum_stats(db: Session, museum: Museum, museum_data: Dict[str, Any]) -> None:
-    """Create museum statistics record."""
-    try:
-        # Check if stats already exist for this museum
-        existing_stat = db.query(MuseumStat).filter(
-            MuseumStat.museum_id == museum.id
-        ).first()
-
-        if existing_stat:
-            logger.debug(f"Museum stats for {museum.name} already exist, skipping")
-            return
-
-        current_time = datetime.now().isoformat()
-        stat = MuseumStat(
-            museum_id=museum.id,
-            year=int(museum_data.get("year", 0)),
-            visitors=int(museum_data.get("visitors", 0)),
-            last_updated=current_time
-        )
-
-        db.add(stat)
-        logger.info(f"Created museum stats: {museum.name} - {stat.visitors} visitors in {stat.year}")
+def _upsert_museums(db: Session, museums_data: List[Dict[str, Any]], city_ids: Dict[tuple, int], now_iso: str) -> Dict[tuple, int]:
+    """Insert all museums that are not stored yet.
+
+    Returns a {(name, city_id): id} map covering both new and existing museums.
+    """
+    museum_keys = list(dict.fromkeys(_museum_key(museum_data, city_ids) for museum_data in museums_data))
+
+    rows = {
+        (museum_name, city_id): {
+            "name": museum_name,
+            "city_id": city_id,
+            "wikidata_id": None,  # Could be fetched from Wikidata
+            "last_updated": now_iso
+        }
+        for museum_name, city_id in museum_keys
+    }
+
+    return _get_or_insert_ids(db, Museum, ("name", "city_id"), rows)
+
+
+def _get_or_insert_ids(db: Session, model, key_names: tuple, rows: Dict[tuple, Dict[str, Any]]) -> Dict[tuple, int]:
+    """Return the ids of `rows` keyed by their `key_names` values, inserting the ones not stored yet.
+
+    Existing ids are preloaded in one SELECT, and the missing rows are inserted
+    in one statement whose RETURNING clause supplies their ids.
+    """
+    key_columns = [getattr(model, name) for name in key_names]
+    ids = _select_ids(db, model, key_columns, list(rows))
+
+    missing = [row for key, row in rows.items() if key not in ids]
+    if missing:
+        result = db.execute(
+            _insert(db, model)
+            .on_conflict_do_nothing(index_elements=list(key_names))
+            .returning(model.id, *key_columns),
+            missing
+        ).all()
+        ids.update({tuple(key): row_id for row_id, *key in result})
+        logger.info(f"Inserted {len(result)} rows into {model.__tablename__}")
+
+        # Rows inserted by a concurrent run are skipped by ON CONFLICT and not returned
+        not_returned = [key for key in rows if key not in ids]
+        if not_returned:
+            ids.update(_select_ids(db, model, key_columns, not_returned))
+
+    return ids
 
-    except Exception as e:
-        logger.error(f"Error creating museum stats: {e}")
-        db.rollback()  # Rollback on error
+
+def _insert(db: Session, model):
+    """Return an INSERT for `model` in the session's dialect, for its ON CONFLICT support.
+
+    PostgreSQL is the deployed database; SQLite backs the tests.
+    """
+    dialect = sqlite if db.get_bind().dialect.name == "sqlite" else postgresql
+    return dialect.insert(model)
+
+
+def _select_ids(db: Session, model, key_columns: list, keys: List[tuple]) -> Dict[tuple, int]:
+    """Return a {key: id} map of the stored rows of `model` matching `keys`."""
+    if not keys:
+        return {}
+    result = db.execute(
+        select(model.id, *key_columns).where(tuple_(*key_columns).in_(keys))
+    ).all()
+    return {tuple(key): row_id for row_id, *key in result}
+
+
+def _insert_museum_stats(db: Session, museums_data: List[Dict[str, Any]], city_ids: Dict[tuple, int], museum_ids: Dict[tuple, int], now_iso: str) -> None:
+    """Insert the visitor statistics of all museums, skipping (museum, year) pairs already stored.
+
+    Rows whose year or visitor count is not an integer are logged and skipped,
+    so one bad row does not abort the load.
+    """
+    rows = []
+    for museum_data in museums_data:
+        museum_id = museum_ids.get(_museum_key(museum_data, city_ids))
+        if museum_id is None:
+            continue
+        try:
+            year = int(museum_data.get("year", 0))
+            visitors = int(museum_data.get("visitors", 0))
+        except (TypeError, ValueError) as e:
+            logger.error(f"Error processing museum {museum_data.get('name', 'Unknown')}: {e}")
+            continue
+        rows.append({
+            "museum_id": museum_id,
+            "year": year,
+            "visitors": visitors,
+            "last_updated": now_iso
+        })
+
+    if rows:
+        # RETURNING yields only the rows actually inserted, not those skipped by ON CONFLICT
+        inserted = db.execute(
+            _insert(db, MuseumStat)
+            .on_conflict_do_nothing(index_elements=["museum_id", "year"])
+            .returning(MuseumStat.id),
+            rows
+        ).all()
+        logger.info(f"Inserted museum stats for {len(inserted)} of {len(rows)} museums")
+
+
+def _city_key(museum_data: Dict[str, Any]) -> tuple:
+    """Return the (name, country) key of a museum's city."""
+    return museum_data.get("city", "Unknown"), museum_data.get("country", "Unknown")
+
+
+def _museum_key(museum_data: Dict[str, Any], city_ids: Dict[tuple, int]) -> tuple:
+    """Return the (name, city_id) key of a museum."""
+    return museum_data.get("name", "Unknown"), city_ids.get(_city_key(museum_data))
+
+
+def _select_stored_cities(city_keys: List[tuple]) -> Dict[tuple, tuple]:
+    """Return a {(name, country): (population, wikidata_id)} map of the stored cities among `city_keys`."""
+    with SessionLocal() as db:
+        rows = db.execute(
+            select(City.name, City.country, City.population, City.wikidata_id)
+            .where(tuple_(City.name, City.country).in_(city_keys))
+        ).all()
+    return {(name, country): (population, wikidata_id) for name, country, population, wikidata_id in rows}
 
 
 async def _fetch_city_populations_for_museums(museums_data: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
@@ -200,79 +291,64 @@ async def _fetch_city_populations_for_museums(museums_data: List[Dict[str, Any]]
 
         unique_cities.add((city_name, country))
 
-    # First, check database for existing cities
-    cities_to_fetch = []
-    for city_name, country in unique_cities:
-        with SessionLocal() as db:
-            city = db.query(City).filter(City.name == city_name, City.country == country).first()
-            if not city:
-                cities_to_fetch.append((city_name, country))
-                continue
-
-            city_populations[city_name] = {
-                "population": city.population,
-                "wikidata_id": city.wikidata_id
-            }
-            logger.info(f"Using cached population data for {city_name}: {city.population}")
-
-    # Fetch population data for remaining cities in parallel (batched to avoid rate limits)
+    # First, check database for existing cities in a single query
+    cached = await asyncio.to_thread(_select_stored_cities, list(unique_cities))
+
+    cities_to_fetch = [city for city in unique_cities if city not in cached]
+    for (city_name, country), (population, wikidata_id) in cached.items():
+        city_populations[city_name] = {
+            "population": population,
+            "wikidata_id": wikidata_id
+        }
+        logger.info(f"Using cached population data for {city_name}: {population}")
+
+    # Fetch population data for remaining cities in parallel (bounded to avoid rate limits)
     if not cities_to_fetch:
         logger.info("No cities to fetch population data for")
         return city_populations
 
-    logger.info(f"Fetching population data for {len(cities_to_fetch)} cities in parallel (batched)...")
+    logger.info(f"Fetching population data for {len(cities_to_fetch)} cities in parallel...")
 
-    async def fetch_single_city_population(city_name: str, country: str) -> tuple[str, dict]:
-        """Fetch population data for a single city."""
-        try:
-            logger.info(f"Fetching population data for city: {city_name}, {country}")
-
-            # Search for the city's Wikidata QID
-            qid = await search_city_by_name(city_name)
+    # At most 10 searches in flight, so a slow city does not hold back a whole batch
+    # TODO: make this configurable
+    semaphore = asyncio.Semaphore(10)
 
+    async def search_single_city(city_name: str, country: str) -> tuple[str, str | None]:
+        """Look up the Wikidata QID of a single city."""
+        try:
+            async with semaphore:
+                logger.info(f"Searching Wikidata QID for city: {city_name}, {country}")
+                qid = await search_city_by_name(city_name)
             if not qid:
                 logger.warning(f"Could not find Wikidata QID for city: {city_name}, {country}")
-                return city_name, {}
-            # Fetch population data using the QID
-            population_data = await fetch_city_population(qid)
-            if not population_data:
-                logger.warning(f"No population data found for {city_name} (QID: {qid})")
-                return city_name, {}
-
-            logger.info(f"Found population data for {city_name}: {population_data.get('population', 0)}")
-            return city_name, population_data
+            return city_name, qid
         except Exception as e:
-            logger.error(f"Error fetching population for {city_name}: {e}")
-            return city_name, {}
-
-    # Process cities in batches of 10 to avoid overwhelming the API
-    # TODO: make this configurable
-    batch_size = 10
-    all_results = []
-
-    for i in range(0, len(cities_to_fetch), batch_size):
-        #Process cities in batches of 10 to avoid overwhelming the API, also this is a slow API
-        batch = cities_to_fetch[i:i + batch_size]
-        logger.info(f"Processing batch {i//batch_size + 1}/{(len(cities_to_fetch) + batch_size - 1)//batch_size} ({len(batch)} cities)")
+            logger.error(f"Error searching QID for {city_name}: {e}")
+            return city_name, None
 
-        # Use asyncio.gather to fetch cities in this batch in parallel
-        batch_results = await asyncio.gather(
-            *[fetch_single_city_population(city_name, country) for city_name, country in batch],
-            return_exceptions=True
-        )
-
-        all_results.extend(batch_results)
-
-        # Small delay between batches to be respectful to the API
-        if i + batch_size < len(cities_to_fetch):
-            await asyncio.sleep(0.5)
+    all_results = await asyncio.gather(
+        *[search_single_city(city_name, country) for city_name, country in cities_to_fetch],
+        return_exceptions=True
+    )
 
-    # Process all results
+    city_qids = {}
     for result in all_results:
         if isinstance(result, Exception):
             logger.error(f"Unexpected error in parallel fetch: {result}")
             continue
-        city_name, population_data = result
+        city_name, qid = result
+        city_populations[city_name] = {}
+        if qid:
+            city_qids[city_name] = qid
+
+    # Fetch the populations of all found cities in a single SPARQL query
+    populations_by_qid = await fetch_city_populations_bulk(list(city_qids.values()))
+    for city_name, qid in city_qids.items():
+        population_data = populations_by_qid.get(qid, {})
+        if population_data:
+            logger.info(f"Found population data for {city_name}: {population_data.get('population', 0)}")
+        else:
+            logger.warning(f"No population data found for {city_name} (QID: {qid})")
         city_populations[city_name] = population_data
 
     return city_populations
@@ -1,56 +1,60 @@
 """Feature engineering for museum attendance data."""
+import threading
 import pandas as pd
 import numpy as np
-from src.db.session import SessionLocal
+from cachetools import TTLCache
+from sqlalchemy import func, select
+from src.db.session import engine
 from src.db.models import Museum, City, MuseumStat
 
+_FEATURE_COLUMNS = ["museum_id", "museum_name", "city_id", "city_name", "visitors", "population"]
+_FEATURE_DTYPES = {"visitors": "int64", "population": "int64"}
+
+# Built once at import so every call reuses the same statement and its cached
+# compiled form. Plain columns only; missing populations count as 0.
+_FEATURES_STMT = select(
+    Museum.id.label('museum_id'),
+    Museum.name.label('museum_name'),
+    City.id.label('city_id'),
+    City.name.label('city_name'),
+    MuseumStat.visitors,
+    func.coalesce(City.population, 0).label('population')
+).join(
+    City, Museum.city_id == City.id
+).join(
+    MuseumStat, Museum.id == MuseumStat.museum_id
+)
+
+
+# The features only change when the ETL writes, which clears this cache; the
+# TTL bounds staleness when another process runs the ETL
+_FEATURES_CACHE: TTLCache = TTLCache(maxsize=1, ttl=60)
+_FEATURES_CACHE_LOCK = threading.Lock()
+
 
 def load_features() -> pd.DataFrame:
     """Load features from the database by joining museums, cities, and stats."""
+    with _FEATURES_CACHE_LOCK:
+        cached = _FEATURES_CACHE.get("features")
+    if cached is not None:
+        return cached.copy()
+
     try:
-        with SessionLocal() as db:
-            # Query to join all tables
-            query = db.query(
-                Museum.id.label('museum_id'),
-                Museum.name.label('museum_name'),
-                City.id.label('city_id'),
-                City.name.label('city_name'),
-                MuseumStat.visitors,
-                City.population
-            ).join(
-                City, Museum.city_id == City.id
-            ).join(
-                MuseumStat, Museum.id == MuseumStat.museum_id
-            )
-
-            # Execute query and convert to DataFrame
-            results = query.all()
-
-            if not results:
-                return pd.DataFrame(columns=["museum_id", "museum_name", "city_id", "city_name", "visitors", "population"])
-
-            # Convert to list of dictionaries
-            data = []
-            for row in results:
-                data.append({
-                    'museum_id': row.museum_id,
-                    'museum_name': row.museum_name,
-                    'city_id': row.city_id,
-                    'city_name': row.city_name,
-                    'visitors': row.visitors,
-                    'population': row.population
-                })
-
-            df = pd.DataFrame(data)
-
-            # Ensure numeric columns are properly typed
-            if 'population' in df.columns:
-                df['population'] = pd.to_numeric(df['population'], errors='coerce').fillna(0).astype(int)
-            if 'visitors' in df.columns:
-                df['visitors'] = pd.to_numeric(df['visitors'], errors='coerce').fillna(0).astype(int)
-
-            return df
+        # A read-only query needs no ORM session, just a pooled connection
+        with engine.connect() as conn:
+            # Read straight into typed columns, so no numeric coercion pass is needed
+            df = pd.read_sql_query(_FEATURES_STMT, conn, dtype=_FEATURE_DTYPES)
 
     except Exception as e:
         print(f"Error loading features: {e}")
-        return pd.DataFrame(columns=["museum_id", "museum_name", "city_id", "city_name", "visitors", "population"])
+        return pd.DataFrame(columns=_FEATURE_COLUMNS)
+
+    with _FEATURES_CACHE_LOCK:
+        _FEATURES_CACHE["features"] = df
+    return df.copy()
+
+
+def clear_features_cache() -> None:
+    """Drop the cached features so the next load_features call reads the database."""
+    with _FEATURES_CACHE_LOCK:
+        _FEATURES_CACHE.clear()
@@ -1,22 +1,63 @@
 from typing import Dict, Any
 import numpy as np
-from sklearn.linear_model import LinearRegression
+
+
+def _regression_metrics(y: np.ndarray, preds: np.ndarray) -> Dict[str, float]:
+    """Compute r2, MAE and RMSE from a single residual array using NumPy reductions."""
+    resid = y - preds
+    # np.dot reduces in BLAS without materializing the squared deviations
+    ss_res = float(np.dot(resid, resid))
+    y_dev = y - y.mean()
+    ss_tot = float(np.dot(y_dev, y_dev))
+    # Match sklearn's r2_score for constant y: 1.0 for a perfect fit, 0.0 otherwise
+    r2 = 1.0 - ss_res / ss_tot if ss_tot > 0 else float(ss_res == 0)
+    return {
+        "r2": r2,
+        "mae": float(np.abs(resid).mean()),
+        "rmse": float(np.sqrt(ss_res / resid.size)),
+    }
 
 
 def fit_linear_regression(X: np.ndarray, y: np.ndarray) -> Dict[str, Any]:
     if X.size == 0 or y.size == 0:
         return {"n_samples": 0, "r2": None, "mae": None, "rmse": None}
-    model = LinearRegression()
-    model.fit(X, y)
-    preds = model.predict(X)
-    r2 = model.score(X, y)
-    mae = float(np.mean(np.abs(preds - y)))
-    rmse = float(np.sqrt(np.mean((preds - y) ** 2)))
+    X = np.asarray(X, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # Solve OLS on centered data, as sklearn's LinearRegression does, then
+    # recover the intercept from the means
+    X_mean = X.mean(axis=0)
+    y_mean = y.mean()
+    coef, *_ = np.linalg.lstsq(X - X_mean, y - y_mean, rcond=None)
+    intercept = float(y_mean - X_mean @ coef)
+    preds = X @ coef + intercept
+    return {
+        "n_samples": int(len(y)),
+        **_regression_metrics(y, preds),
+        "coef": coef.tolist(),
+        "intercept": intercept,
+    }
+
+
+def fit_simple_linear_regression(x: np.ndarray, y: np.ndarray) -> Dict[str, Any]:
+    """Fit y = slope * x + intercept on a single feature using the closed-form OLS solution.
+
+    Same result as fit_linear_regression(x.reshape(-1, 1), y) without the
+    lstsq solve, which dominates for one feature.
+    """
+    if x.size == 0 or y.size == 0:
+        return {"n_samples": 0, "r2": None, "mae": None, "rmse": None}
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # Centered sums keep the normal equations well conditioned for population-sized x
+    x_mean = x.mean()
+    y_mean = y.mean()
+    dx = x - x_mean
+    sxx = float(np.sum(dx * dx))
+    slope = float(np.sum(dx * (y - y_mean))) / sxx if sxx > 0 else 0.0
+    intercept = float(y_mean - slope * x_mean)
     return {
         "n_samples": int(len(y)),
-        "r2": float(r2),
-        "mae": mae,
-        "rmse": rmse,
-        "coef": model.coef_.tolist(),
-        "intercept": float(model.intercept_),
+        **_regression_metrics(y, slope * x + intercept),
+        "coef": [slope],
+        "intercept": intercept,
     }
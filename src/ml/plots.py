@@ -2,11 +2,25 @@ from typing import Optional
 import pandas as pd
 import matplotlib.pyplot as plt
 
+# Above this many points a scatter's per-marker paths get slow to build and
+# draw, so the density is shown as a hexbin instead
+_HEXBIN_THRESHOLD = 50_000
+
 
 def scatter_population_visitors(df: pd.DataFrame, loglog: bool = False, title: Optional[str] = None):
     fig, ax = plt.subplots(figsize=(6, 4))
     if not df.empty:
-        ax.scatter(df["population"], df["visitors"], alpha=0.6)
+        x = df["population"].to_numpy()
+        y = df["visitors"].to_numpy()
+        if len(x) > _HEXBIN_THRESHOLD:
+            if loglog:
+                # Log-scaled bins cannot hold non-positive values; a log scatter drops them too
+                positive = (x > 0) & (y > 0)
+                x, y = x[positive], y[positive]
+            scale = "log" if loglog else "linear"
+            ax.hexbin(x, y, gridsize=80, xscale=scale, yscale=scale, mincnt=1)
+        else:
+            ax.scatter(x, y, alpha=0.6)
     ax.set_xlabel("City population")
     ax.set_ylabel("Museum annual visitors")
     if loglog:
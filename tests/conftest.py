@@ -1,131 +1,133 @@
 """Pytest configuration and fixtures."""
+import os
+
+# Tests patch the HTTP layer per test, so cached SPARQL responses must not leak between them
+os.environ["SPARQL_CACHE_TTL"] = "0"
+
+import httpx
 import pytest
+import respx
 import asyncio
-from unittest.mock import AsyncMock, Mock, patch
 from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
 from src.api.main import app
+from src.clients import _http, wikipedia
+from src.core.config import settings
+from src.db.models import Base
+from src.ml.features import clear_features_cache
 
 
-@pytest.fixture
+# Museums table served by the mocked Wikipedia API
+_LOUVRE_MET_HTML = """
+<table class="wikitable sortable">
+<thead><tr><th>Museum</th><th>Visitors</th><th>City</th><th>Country</th></tr></thead>
+<tbody>
+<tr><td>Louvre</td><td>9,600,000 (2023)</td><td>Paris</td><td>France</td></tr>
+<tr><td>Metropolitan Museum</td><td>6,479,548 (2023)</td><td>New York</td><td>United States</td></tr>
+</tbody>
+</table>
+"""
+
+
+@pytest.fixture(scope="session")
 def client():
-    """Create a test client for the FastAPI app."""
-    return TestClient(app)
+    """Create a test client for the FastAPI app, started once for the whole session."""
+    with TestClient(app) as test_client:
+        yield test_client
 
 
-@pytest.fixture
-def mock_wikipedia_response():
-    """Mock Wikipedia API response."""
-    return {
-        "parse": {
-            "text": {
-                "*": """
-                <table class="wikitable sortable">
-                <thead><tr><th>Museum</th><th>Visitors</th><th>City</th><th>Country</th></tr></thead>
-                <tbody>
-                <tr><td>Louvre</td><td>9,600,000 (2023)</td><td>Paris</td><td>France</td></tr>
-                <tr><td>Metropolitan Museum</td><td>6,479,548 (2023)</td><td>New York</td><td>United States</td></tr>
-                <tr><td>British Museum</td><td>5,820,860 (2023)</td><td>London</td><td>United Kingdom</td></tr>
-                </tbody>
-                </table>
-                """
-            }
-        }
-    }
+@pytest.fixture(autouse=True)
+def reset_http_clients():
+    """Drop pooled HTTP clients and cached pages so each test starts from a clean slate."""
+    yield
+    _http._CLIENTS.clear()
+    wikipedia._PAGE_CACHE.clear()
 
 
-@pytest.fixture
-def mock_wikidata_response():
-    """Mock Wikidata SPARQL response."""
-    return {
-        "results": {
-            "bindings": [
-                {
-                    "city": {"value": "Paris"},
-                    "population": {"value": "11000000"},
-                    "wikidata_id": {"value": "Q90"}
-                },
-                {
-                    "city": {"value": "New York"},
-                    "population": {"value": "8336817"},
-                    "wikidata_id": {"value": "Q60"}
-                },
-                {
-                    "city": {"value": "London"},
-                    "population": {"value": "8982000"},
-                    "wikidata_id": {"value": "Q84"}
-                }
-            ]
-        }
-    }
+@pytest.fixture(autouse=True)
+def reset_features_cache():
+    """Drop cached features so each test reads its own (mocked) database."""
+    yield
+    clear_features_cache()
 
 
 @pytest.fixture
-def mock_httpx_client():
-    """Mock httpx client for external API calls."""
-    mock_client = AsyncMock()
-
-    # Mock Wikipedia API response
-    wikipedia_response = AsyncMock()
-    wikipedia_response.status_code = 200
-    wikipedia_response.json = Mock(return_value={
+def mock_http():
+    """Answer the Wikipedia and Wikidata APIs from respx routes."""
+    wikipedia_payload = {
         "parse": {
             "text": {
-                "*": """
-                <table class="wikitable sortable">
-                <thead><tr><th>Museum</th><th>Visitors</th><th>City</th><th>Country</th></tr></thead>
-                <tbody>
-                <tr><td>Louvre</td><td>9,600,000 (2023)</td><td>Paris</td><td>France</td></tr>
-                <tr><td>Metropolitan Museum</td><td>6,479,548 (2023)</td><td>New York</td><td>United States</td></tr>
-                </tbody>
-                </table>
-                """
+                "*": _LOUVRE_MET_HTML
             }
         }
-    })
-
-    # Mock Wikidata SPARQL response
-    wikidata_response = AsyncMock()
-    wikidata_response.status_code = 200
-    wikidata_response.json = Mock(return_value={
-        "results": {
-            "bindings": [
-                {
-                    "city": {"value": "Paris"},
-                    "population": {"value": "11000000"},
-                    "wikidata_id": {"value": "Q90"}
-                },
+    }
+    # QID and latest population of each city in the mocked museums table
+    cities = {
+        "Paris": ("Q90", "11000000"),
+        "New York": ("Q60", "8336817")
+    }
+
+    def wikidata_response(request):
+        query = request.url.params["query"]
+        if "VALUES ?city" in query:
+            # Bulk population query for the QIDs found by the searches
+            bindings = [
                 {
-                    "city": {"value": "New York"},
-                    "population": {"value": "8336817"},
-                    "wikidata_id": {"value": "Q60"}
+                    "city": {"type": "uri", "value": f"http://www.wikidata.org/entity/{qid}"},
+                    "population": {"value": population},
+                    "pointInTime": {"value": "2023-01-01T00:00:00Z"},
+                    "cityName": {"value": name}
                 }
+                for name, (qid, population) in cities.items()
+                if f"wd:{qid}" in query
             ]
-        }
-    })
-
-    # Configure mock client to return different responses based on URL
-    async def mock_get(url, **kwargs):
-        if "wikipedia.org" in url:
-            return wikipedia_response
-        elif "wikidata.org" in url:
-            return wikidata_response
         else:
-            raise ValueError(f"Unexpected URL: {url}")
+            # City search by name
+            bindings = [
+                {
+                    "city": {"type": "uri", "value": f"http://www.wikidata.org/entity/{qid}"},
+                    "cityLabel": {"value": name}
+                }
+                for name, (qid, _) in cities.items()
+                if f'"{name}"' in query
+            ]
+        return httpx.Response(200, json={"results": {"bindings": bindings}})
+
+    with respx.mock(assert_all_called=False) as respx_mock:
+        respx_mock.get(settings.wikipedia_api_url).mock(return_value=httpx.Response(200, json=wikipedia_payload))
+        respx_mock.get(settings.wikidata_endpoint).mock(side_effect=wikidata_response)
+        yield respx_mock
 
-    mock_client.get = mock_get
-    mock_client.__aenter__ = AsyncMock(return_value=mock_client)
-    mock_client.__aexit__ = AsyncMock(return_value=None)
 
-    return mock_client
+@pytest.fixture(scope="session")
+def sqlite_engine():
+    """Create an in-memory SQLite engine with the schema, shared by the whole session."""
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool
+    )
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
 
 
 @pytest.fixture
-def mock_database():
-    """Mock database operations."""
-    with patch('src.db.session.SessionLocal') as mock_session:
-        mock_db = AsyncMock()
-        mock_session.return_value = mock_db
-        yield mock_db
+def sqlite_db(sqlite_engine, monkeypatch):
+    """Point the ETL and feature loading at the in-memory database.
+
+    Yields the session factory; tables are emptied after each test.
+    """
+    testing_session_local = sessionmaker(autocommit=False, autoflush=False, bind=sqlite_engine)
+    monkeypatch.setattr("src.etl.pipeline.SessionLocal", testing_session_local)
+    monkeypatch.setattr("src.etl.pipeline.engine", sqlite_engine)
+    monkeypatch.setattr("src.ml.features.engine", sqlite_engine)
+    yield testing_session_local
+    with sqlite_engine.begin() as conn:
+        for table in reversed(Base.metadata.sorted_tables):
+            conn.execute(table.delete())
 
 
 @pytest.fixture(scope="session")
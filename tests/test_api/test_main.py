@@ -1,7 +1,8 @@
 """Tests for API endpoints."""
 import pytest
+import pandas as pd
+from unittest.mock import patch
 from fastapi.testclient import TestClient
-from src.api.main import app
 
 
 def test_healthcheck(client: TestClient):
@@ -23,6 +24,25 @@ def test_features_empty(client: TestClient):
     assert data["columns"] == expected_columns
 
 
+def test_features_rows(client: TestClient):
+    """Test features endpoint serializes each row as values in column order."""
+    df = pd.DataFrame({
+        "museum_id": [1, 2],
+        "museum_name": ["Louvre", "Metropolitan Museum"],
+        "city_id": [1, 2],
+        "city_name": ["Paris", "New York"],
+        "visitors": [9600000, 6479548],
+        "population": [11000000, 8336817],
+    })
+    with patch('src.ml.features.load_features', return_value=df):
+        response = client.get("/features")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["count"] == 2
+    assert data["columns"] == df.columns.tolist()
+    assert data["rows"][0] == [1, "Louvre", 1, "Paris", 9600000, 11000000]
+
+
 def test_etl_run(client: TestClient):
     """Test ETL run endpoint."""
     response = client.post("/etl/run")
@@ -1,17 +1,75 @@
 """Tests for Wikidata client."""
+from dataclasses import replace
+import orjson
 import pytest
-from unittest.mock import patch, AsyncMock
-from src.clients.wikidata import fetch_city_population
+from unittest.mock import patch, AsyncMock, Mock
+from src.clients import wikidata
+from src.clients.wikidata import fetch_city_population, fetch_city_populations_bulk
 
 
 @pytest.mark.asyncio
 async def test_fetch_city_population():
     """Test fetching city population from Wikidata."""
-    with patch('src.clients.wikidata.httpx.AsyncClient') as mock_client:
-        mock_response = AsyncMock()
+    with patch('src.clients._http.httpx.AsyncClient') as mock_client:
+        mock_response = Mock()
         mock_response.status_code = 200
-        mock_response.json.return_value = {"results": {"bindings": []}}
-        mock_client.return_value.__aenter__.return_value.get.return_value = mock_response
+        mock_response.content = orjson.dumps({"results": {"bindings": []}})
+        mock_client.return_value.get = AsyncMock(return_value=mock_response)
 
         result = await fetch_city_population("Q90")
         assert isinstance(result, dict)
+
+
+@pytest.mark.asyncio
+async def test_http_client_reused_across_calls():
+    """Test that consecutive lookups share one pooled HTTP client."""
+    with patch('src.clients._http.httpx.AsyncClient') as mock_client:
+        mock_response = Mock()
+        mock_response.content = orjson.dumps({"results": {"bindings": []}})
+        mock_client.return_value.get = AsyncMock(return_value=mock_response)
+
+        await fetch_city_population("Q90")
+        await fetch_city_population("Q60")
+        assert mock_client.call_count == 1
+        assert mock_client.return_value.get.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_sparql_responses_cached():
+    """Test that a repeated SPARQL query is served from the TTL cache."""
+    with patch('src.clients._http.httpx.AsyncClient') as mock_client, \
+         patch.object(wikidata, 'settings', replace(wikidata.settings, sparql_cache_ttl=3600)), \
+         patch.object(wikidata, '_SPARQL_CACHE', {}):
+        mock_response = Mock()
+        mock_response.content = orjson.dumps({"results": {"bindings": [
+            {"population": {"value": "2103778"}, "cityName": {"value": "Paris"}}
+        ]}})
+        mock_client.return_value.get = AsyncMock(return_value=mock_response)
+
+        first = await fetch_city_population("Q90")
+        second = await fetch_city_population("Q90")
+        assert first == second == {"population": 2103778, "city_name": "Paris", "wikidata_id": "Q90"}
+        assert mock_client.return_value.get.await_count == 1
+
+
+@pytest.mark.asyncio
+async def test_fetch_city_populations_bulk_keeps_latest():
+    """Test that one bulk query returns the newest population per city."""
+    with patch('src.clients._http.httpx.AsyncClient') as mock_client:
+        mock_response = Mock()
+        mock_response.content = orjson.dumps({"results": {"bindings": [
+            {"city": {"value": "http://www.wikidata.org/entity/Q60"},
+             "population": {"value": "8336817"}, "cityName": {"value": "New York City"}},
+            {"city": {"value": "http://www.wikidata.org/entity/Q60"},
+             "population": {"value": "8175133"}, "cityName": {"value": "New York City"}},
+            {"city": {"value": "http://www.wikidata.org/entity/Q90"},
+             "population": {"value": "2103778"}, "cityName": {"value": "Paris"}}
+        ]}})
+        mock_client.return_value.get = AsyncMock(return_value=mock_response)
+
+        result = await fetch_city_populations_bulk(["Q90", "Q60"])
+        assert result == {
+            "Q60": {"population": 8336817, "city_name": "New York City", "wikidata_id": "Q60"},
+            "Q90": {"population": 2103778, "city_name": "Paris", "wikidata_id": "Q90"}
+        }
+        assert mock_client.return_value.get.await_count == 1
@@ -1,17 +1,99 @@
 """Tests for Wikipedia client."""
+import orjson
 import pytest
-from unittest.mock import patch, AsyncMock
-from src.clients.wikipedia import fetch_most_visited_museums
+from unittest.mock import patch, AsyncMock, Mock
+from src.clients import wikipedia
+from src.clients.wikipedia import fetch_most_visited_museums, clean_html, _parse_museum_data_from_content
 
 
 @pytest.mark.asyncio
 async def test_fetch_most_visited_museums():
     """Test fetching most visited museums."""
-    with patch('src.clients.wikipedia.httpx.AsyncClient') as mock_client:
-        mock_response = AsyncMock()
+    with patch('src.clients._http.httpx.AsyncClient') as mock_client:
+        mock_response = Mock()
         mock_response.status_code = 200
-        mock_response.json.return_value = {"query": {"pages": []}}
-        mock_client.return_value.__aenter__.return_value.get.return_value = mock_response
+        mock_response.content = orjson.dumps({"query": {"pages": []}})
+        mock_client.return_value.get = AsyncMock(return_value=mock_response)
 
         result = await fetch_most_visited_museums()
         assert isinstance(result, list)
+
+
+@pytest.mark.asyncio
+async def test_unchanged_page_served_from_etag_cache():
+    """Test that a 304 reply reuses the page content of the previous fetch."""
+    html = (
+        '<table class="wikitable"><tbody>'
+        '<tr><td>Louvre</td><td>8,700,000 (2024)</td><td>Paris</td><td>France</td></tr>'
+        '</tbody></table>'
+    )
+    fresh = Mock(status_code=200, headers={"etag": '"v1"'})
+    fresh.content = orjson.dumps({"parse": {"text": {"*": html}}})
+    not_modified = Mock(status_code=304, headers={})
+
+    with patch('src.clients._http.httpx.AsyncClient') as mock_client:
+        mock_client.return_value.get = AsyncMock(side_effect=[fresh, not_modified])
+
+        first = await fetch_most_visited_museums()
+        second = await fetch_most_visited_museums()
+
+        assert first == second
+        assert first[0]["name"] == "Louvre"
+        second_call = mock_client.return_value.get.await_args_list[1]
+        assert second_call.kwargs["headers"] == {"If-None-Match": '"v1"'}
+
+
+def test_clean_html_plain_text():
+    """Test cleaning text that contains no markup."""
+    assert clean_html(' "Louvre"[1] ') == "Louvre"
+    assert clean_html("![](//upload.wikimedia.org/flag.svg) France") == "France"
+    assert clean_html("") == ""
+
+
+def test_clean_html_markup():
+    """Test cleaning text that still contains tags, references and entities."""
+    html = '<a href="/wiki/Louvre">Louvre</a><sup class="reference">[a]</sup> &amp; <img src="x.png">Co'
+    assert clean_html(html) == "Louvre & Co"
+
+
+def test_parse_only_first_wikitable():
+    """Test that tables around the museum table are ignored."""
+    row = '<tr><td>{}</td><td>8,700,000 (2024)</td><td>Paris</td><td>France</td></tr>'
+    html = (
+        f'<table class="infobox"><tbody>{row.format("Infobox")}</tbody></table>'
+        f'<table class="wikitable sortable"><tbody>{row.format("Louvre")}</tbody></table>'
+        f'<table class="wikitable"><tbody>{row.format("Other list")}</tbody></table>'
+    )
+    museums = _parse_museum_data_from_content(html)
+    assert [museum["name"] for museum in museums] == ["Louvre"]
+
+
+def test_parse_keeps_rows_after_nested_table():
+    """Test that a table nested in a cell does not cut off the rows after it."""
+    html = (
+        '<table class="wikitable sortable"><tbody>'
+        '<tr><td>Louvre</td><td>8,700,000 (2024)</td><td>Paris</td><td>France</td></tr>'
+        '<tr><td>Orsay</td><td>3,700,000 (2024)</td><td>Paris</td><td>France</td>'
+        '<td><table><tbody><tr><td>Note</td></tr></tbody></table></td></tr>'
+        '<tr><td>British Museum</td><td>5,800,000 (2024)</td><td>London</td><td>United Kingdom</td></tr>'
+        '</tbody></table>'
+    )
+    museums = _parse_museum_data_from_content(html)
+    assert [museum["name"] for museum in museums] == ["Louvre", "Orsay", "British Museum"]
+
+
+def test_parse_reused_for_unchanged_page():
+    """Test that parsing the same page twice runs the table parser once."""
+    html = (
+        '<table class="wikitable"><tbody>'
+        '<tr><td>Louvre</td><td>8,700,000 (2024)</td><td>Paris</td><td>France</td></tr>'
+        '</tbody></table>'
+    )
+    with patch.object(wikipedia, '_PARSE_CACHE', {}), \
+         patch.object(wikipedia, '_parse_museum_table', wraps=wikipedia._parse_museum_table) as parse:
+        first = _parse_museum_data_from_content(html)
+        first[0]["name"] = "changed"
+        second = _parse_museum_data_from_content(html)
+
+        assert parse.call_count == 1
+        assert second[0]["name"] == "Louvre"
@@ -1,21 +1,25 @@
 """Unit tests for museum data extraction from HTML table cells."""
 import pytest
-from bs4 import BeautifulSoup
+from selectolax.lexbor import LexborHTMLParser
 from src.clients.wikipedia import _extract_museum_from_cells
 
 
+def _td(html: str):
+    """Parse a single <td> fragment into a selectolax node."""
+    return LexborHTMLParser(f"<table><tr>{html}</tr></table>").css_first('td')
+
+
 class TestExtractMuseumFromCells:
     """Test cases for _extract_museum_from_cells function."""
 
     def test_valid_museum_data(self):
         """Test extraction with valid museum data."""
-        # Create Beautiful Soup elements with proper HTML content
-        soup = BeautifulSoup("", 'html.parser')
+        # Create selectolax nodes with proper HTML content
         cells = [
-            BeautifulSoup("<td>Louvre</td>", 'html.parser').find('td'),  # Museum name
-            BeautifulSoup("<td>8,700,000 (2024)</td>", 'html.parser').find('td'),  # Visitors
-            BeautifulSoup("<td>Paris</td>", 'html.parser').find('td'),  # City
-            BeautifulSoup("<td>France</td>", 'html.parser').find('td')  # Country
+            _td("<td>Louvre</td>"),  # Museum name
+            _td("<td>8,700,000 (2024)</td>"),  # Visitors
+            _td("<td>Paris</td>"),  # City
+            _td("<td>France</td>")  # Country
         ]
 
         result = _extract_museum_from_cells(cells)
@@ -28,12 +32,12 @@ class TestExtractMuseumFromCells:
 
     def test_museum_with_html_tags_and_references(self):
         """Test extraction with HTML tags and reference numbers."""
-        # Create Beautiful Soup elements with HTML content
+        # Create selectolax nodes with HTML content
         cells = [
-            BeautifulSoup("<td>[Louvre](/wiki/Louvre \"Louvre\")</td>", 'html.parser').find('td'),  # Museum name with markdown link
-            BeautifulSoup("<td>8,700,000 (2024)[1]</td>", 'html.parser').find('td'),  # Visitors with reference
-            BeautifulSoup("<td>[Paris](/wiki/Paris \"Paris\")</td>", 'html.parser').find('td'),  # City with markdown link
-            BeautifulSoup("<td>![](//upload.wikimedia.org/flag.svg) [France](/wiki/France \"France\")</td>", 'html.parser').find('td')  # Country with flag
+            _td("<td>[Louvre](/wiki/Louvre \"Louvre\")</td>"),  # Museum name with markdown link
+            _td("<td>8,700,000 (2024)[1]</td>"),  # Visitors with reference
+            _td("<td>[Paris](/wiki/Paris \"Paris\")</td>"),  # City with markdown link
+            _td("<td>![](//upload.wikimedia.org/flag.svg) [France](/wiki/France \"France\")</td>")  # Country with flag
         ]
 
         result = _extract_museum_from_cells(cells)
@@ -46,9 +50,9 @@ class TestExtractMuseumFromCells:
     def test_insufficient_cells(self):
         """Test with insufficient number of cells."""
         cells = [
-            BeautifulSoup("<td>Louvre</td>", 'html.parser').find('td'),  # Museum name
-            BeautifulSoup("<td>8,700,000</td>", 'html.parser').find('td'),  # Visitors
-            BeautifulSoup("<td>Paris</td>", 'html.parser').find('td')  # City only, no country
+            _td("<td>Louvre</td>"),  # Museum name
+            _td("<td>8,700,000</td>"),  # Visitors
+            _td("<td>Paris</td>")  # City only, no country
         ]
 
         result = _extract_museum_from_cells(cells)
@@ -58,10 +62,10 @@ class TestExtractMuseumFromCells:
     def test_empty_museum_name(self):
         """Test with empty museum name."""
         cells = [
-            BeautifulSoup("<td></td>", 'html.parser').find('td'),  # Empty museum name
-            BeautifulSoup("<td>8,700,000</td>", 'html.parser').find('td'),
-            BeautifulSoup("<td>Paris</td>", 'html.parser').find('td'),
-            BeautifulSoup("<td>France</td>", 'html.parser').find('td')
+            _td("<td></td>"),  # Empty museum name
+            _td("<td>8,700,000</td>"),
+            _td("<td>Paris</td>"),
+            _td("<td>France</td>")
         ]
 
         result = _extract_museum_from_cells(cells)
@@ -71,10 +75,10 @@ class TestExtractMuseumFromCells:
     def test_empty_city(self):
         """Test with empty city."""
         cells = [
-            BeautifulSoup("<td>Louvre</td>", 'html.parser').find('td'),
-            BeautifulSoup("<td>8,700,000</td>", 'html.parser').find('td'),
-            BeautifulSoup("<td></td>", 'html.parser').find('td'),  # Empty city
-            BeautifulSoup("<td>France</td>", 'html.parser').find('td')
+            _td("<td>Louvre</td>"),
+            _td("<td>8,700,000</td>"),
+            _td("<td></td>"),  # Empty city
+            _td("<td>France</td>")
         ]
 
         result = _extract_museum_from_cells(cells)
@@ -84,10 +88,10 @@ class TestExtractMuseumFromCells:
     def test_complex_html_cleaning(self):
         """Test complex HTML cleaning scenarios."""
         cells = [
-            BeautifulSoup("<td><a href='/wiki/Metropolitan_Museum_of_Art'>Metropolitan Museum of Art</a></td>", 'html.parser').find('td'),
-            BeautifulSoup("<td>5,727,258 (2024) [6]</td>", 'html.parser').find('td'),
-            BeautifulSoup("<td><span>New York City</span></td>", 'html.parser').find('td'),
-            BeautifulSoup("<td>![](//upload.wikimedia.org/flag.svg) <a href='/wiki/United_States'>United States</a></td>", 'html.parser').find('td')
+            _td("<td><a href='/wiki/Metropolitan_Museum_of_Art'>Metropolitan Museum of Art</a></td>"),
+            _td("<td>5,727,258 (2024) [6]</td>"),
+            _td("<td><span>New York City</span></td>"),
+            _td("<td>![](//upload.wikimedia.org/flag.svg) <a href='/wiki/United_States'>United States</a></td>")
         ]
 
         result = _extract_museum_from_cells(cells)
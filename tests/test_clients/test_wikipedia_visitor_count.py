@@ -1,6 +1,6 @@
 """Unit tests for visitor count extraction in Wikipedia client."""
 import pytest
-from src.clients.wikipedia import _extract_visitor_count
+from src.clients.wikipedia import _extract_visitor_count, _parse_visitor_cell
 
 
 class TestExtractVisitorCount:
@@ -65,6 +65,13 @@ class TestExtractVisitorCount:
         assert _extract_visitor_count("2,,5 million") == 25000000  # Double comma ignored, becomes 25 million
         assert _extract_visitor_count("2.5 million million") == 2500000  # Double unit, takes first
 
+    def test_abbreviated_units(self):
+        """Test common unit abbreviations."""
+        assert _extract_visitor_count("2.5m") == 2_500_000
+        assert _extract_visitor_count("2.5 mn") == 2_500_000
+        assert _extract_visitor_count("1.2 bn") == 1_200_000_000
+        assert _extract_visitor_count("500k") == 500_000
+
     def test_unknown_units(self):
         """Test unknown units that are ignored."""
         assert _extract_visitor_count("2.5 trillion") == 2  # Unknown unit, returns raw number
@@ -75,3 +82,12 @@ class TestExtractVisitorCount:
         """Test negative numbers (currently not supported)."""
         assert _extract_visitor_count("-2.5 million") == 2500000  # Negative sign ignored
 
+    def test_year_parsed_with_count(self):
+        """Test that the year in parentheses is returned alongside the count."""
+        assert _parse_visitor_cell("8,700,000 (2019)") == (8_700_000, 2019)
+        assert _parse_visitor_cell("2.5 million (2020)") == (2_500_000, 2020)
+        assert _parse_visitor_cell("2.5 million visitors (2021)") == (2_500_000, 2021)
+        assert _parse_visitor_cell("8,700,000 (estimated)") == (8_700_000, 0)
+        assert _parse_visitor_cell("8,700,000 (est.) (2019)") == (8_700_000, 2019)
+        assert _parse_visitor_cell("(2019) 8,700,000") == (8_700_000, 2019)
+        assert _parse_visitor_cell(None) == (0, 0)
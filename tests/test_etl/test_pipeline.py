@@ -1,15 +1,19 @@
 """Tests for ETL pipeline."""
+import threading
 import pytest
 from unittest.mock import patch, AsyncMock
-from src.etl.pipeline import run_etl
+from sqlalchemy import create_engine, inspect, select
+from sqlalchemy.pool import StaticPool
+from src.db.models import MuseumStat
+from src.etl.pipeline import _create_schema, run_etl, run_etl_async
 
 
-@patch('src.etl.pipeline.Base.metadata.create_all')
-@patch('src.etl.pipeline.asyncio.run')
-def test_run_etl(mock_asyncio_run, mock_create_all):
+@patch('src.etl.pipeline._create_schema')
+@patch('src.etl.pipeline._extract_and_load', new_callable=AsyncMock)
+def test_run_etl(mock_extract_and_load, mock_create_schema):
     """Test ETL pipeline."""
     # Mock the async ETL function to return a successful result
-    mock_asyncio_run.return_value = {
+    mock_extract_and_load.return_value = {
         "status": "ok",
         "museums": 5,
         "cities": 3
@@ -21,3 +25,57 @@ def test_run_etl(mock_asyncio_run, mock_create_all):
     assert "cities" in result
     # year field should not be present anymore
     assert "year" not in result
+
+
+async def test_run_etl_async_runs_db_work_off_loop():
+    """Test that schema creation and the load run in worker threads, not on the event loop."""
+    loop_thread = threading.get_ident()
+    threads = []
+
+    def record_thread(*args, **kwargs):
+        threads.append(threading.get_ident())
+        return {}, {}
+
+    museums = [{"name": "Louvre", "city": "Paris", "country": "France", "visitors": 9600000, "year": 2023}]
+    with patch('src.etl.pipeline._create_schema', side_effect=record_thread), \
+         patch('src.etl.pipeline.fetch_most_visited_museums', new_callable=AsyncMock, return_value=museums), \
+         patch('src.etl.pipeline._fetch_city_populations_for_museums', new_callable=AsyncMock, return_value={}), \
+         patch('src.etl.pipeline._load', side_effect=record_thread):
+        result = await run_etl_async()
+
+    assert result["status"] == "ok"
+    assert len(threads) == 2
+    assert loop_thread not in threads
+
+
+def test_create_schema_adds_index_to_existing_table():
+    """Test that schema creation adds the city upsert's unique index to a table created without it."""
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "CREATE TABLE cities (id INTEGER PRIMARY KEY, wikidata_id VARCHAR(32), name VARCHAR(255), "
+            "country VARCHAR(255), population INTEGER, last_updated VARCHAR(64))"
+        )
+
+    with patch('src.etl.pipeline.engine', engine):
+        _create_schema()
+
+    index_names = {index["name"] for index in inspect(engine).get_indexes("cities")}
+    assert "uq_city_name_country" in index_names
+
+
+@patch('src.etl.pipeline._create_schema')
+@patch('src.etl.pipeline._fetch_city_populations_for_museums', new_callable=AsyncMock, return_value={})
+@patch('src.etl.pipeline.fetch_most_visited_museums', new_callable=AsyncMock)
+async def test_run_etl_async_skips_stats_with_bad_year(mock_fetch, mock_populations, mock_create_schema, sqlite_db):
+    """Test that a museum with a non-integer year is skipped without aborting the load."""
+    mock_fetch.return_value = [
+        {"name": "Louvre", "city": "Paris", "country": "France", "visitors": 9600000, "year": 2023},
+        {"name": "Orsay", "city": "Paris", "country": "France", "visitors": 3600000, "year": "n/a"},
+    ]
+
+    result = await run_etl_async()
+
+    assert result["status"] == "ok"
+    with sqlite_db() as db:
+        assert db.execute(select(MuseumStat.visitors)).scalars().all() == [9600000]
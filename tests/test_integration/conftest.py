@@ -0,0 +1,26 @@
+"""Fixtures shared by the integration tests."""
+import pandas as pd
+import pytest
+from unittest.mock import Mock
+
+
+@pytest.fixture(autouse=True)
+def create_schema(monkeypatch):
+    """Stub schema creation on every ETL run; the in-memory test database already has the schema.
+
+    Returns the stub so tests can assert on its calls.
+    """
+    stub = Mock()
+    monkeypatch.setattr("src.etl.pipeline._create_schema", stub)
+    return stub
+
+
+@pytest.fixture(scope="module")
+def louvre_met_df():
+    """Features for two museums, shared read-only by the tests of a module."""
+    return pd.DataFrame({
+        'museum_name': ['Louvre', 'Metropolitan Museum'],
+        'city_name': ['Paris', 'New York'],
+        'population': [11000000, 8336817],
+        'visitors': [9600000, 6479548]
+    })
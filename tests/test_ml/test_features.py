@@ -1,18 +1,37 @@
 """Tests for feature engineering."""
 import pytest
 import pandas as pd
-from src.ml.features import load_features
+from unittest.mock import patch, MagicMock
+from src.ml.features import load_features, clear_features_cache
 
 
-def test_load_features():
+@pytest.fixture(scope="module")
+def features_df():
+    """Load features once for the tests that only inspect the result."""
+    return load_features()
+
+
+def test_load_features(features_df):
     """Test loading features from database."""
-    df = load_features()
-    assert isinstance(df, pd.DataFrame)
-    assert len(df.columns) > 0
+    assert isinstance(features_df, pd.DataFrame)
+    assert len(features_df.columns) > 0
 
 
-def test_load_features_columns():
+def test_load_features_columns(features_df):
     """Test feature columns structure."""
-    df = load_features()
     expected_columns = ["museum_id", "museum_name", "city_id", "city_name", "visitors", "population"]
-    assert df.columns.tolist() == expected_columns
+    assert features_df.columns.tolist() == expected_columns
+
+
+def test_load_features_cached_until_cleared():
+    """Test that repeated loads reuse the cached frame until the cache is cleared."""
+    df = pd.DataFrame({"museum_id": [1], "visitors": [9600000], "population": [2100000]})
+    with patch('src.ml.features.engine', MagicMock()), \
+         patch('src.ml.features.pd.read_sql_query', return_value=df) as read_sql:
+        load_features()
+        assert load_features().equals(df)
+        assert read_sql.call_count == 1
+
+        clear_features_cache()
+        load_features()
+        assert read_sql.call_count == 2
@@ -1,7 +1,7 @@
 """Tests for ML models."""
 import pytest
 import numpy as np
-from src.ml.model import fit_linear_regression
+from src.ml.model import fit_linear_regression, fit_simple_linear_regression
 
 
 def test_fit_linear_regression_empty():
@@ -15,12 +15,51 @@ def test_fit_linear_regression_empty():
     assert result["rmse"] is None
 
 
-def test_fit_linear_regression_simple():
-    """Test linear regression with simple data."""
-    X = np.array([[1], [2], [3], [4]])
-    y = np.array([2, 4, 6, 8])
+@pytest.mark.parametrize("x,slope,intercept", [
+    ([1, 2, 3, 4], 2.0, 0.0),
+    ([0, 1, 2], -1.5, 3.0),
+    ([10, 20, 30, 40, 50], 0.25, -7.0),
+])
+def test_fit_linear_regression_simple(x, slope, intercept):
+    """Test linear regression recovers an exact line."""
+    X = np.array(x, dtype=np.float64).reshape(-1, 1)
+    y = slope * X.ravel() + intercept
     result = fit_linear_regression(X, y)
-    assert result["n_samples"] == 4
-    assert result["r2"] == 1.0  # Perfect fit
-    assert result["mae"] == 0.0
-    assert result["rmse"] == 0.0
+    assert result["n_samples"] == len(x)
+    assert result["r2"] == pytest.approx(1.0)  # Perfect fit
+    assert result["mae"] == pytest.approx(0.0, abs=1e-9)
+    assert result["rmse"] == pytest.approx(0.0, abs=1e-9)
+    assert result["coef"] == pytest.approx([slope])
+    assert result["intercept"] == pytest.approx(intercept, abs=1e-9)
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_fit_linear_regression_matches_polyfit(seed):
+    """Test the fit against NumPy's own least-squares line on noisy data."""
+    rng = np.random.default_rng(seed)
+    x = rng.uniform(0, 100, size=20)
+    y = 1.7 * x + rng.normal(0, 5, size=20)
+    slope, intercept = np.polyfit(x, y, 1)
+    result = fit_linear_regression(x.reshape(-1, 1), y)
+    assert result["coef"] == pytest.approx([slope])
+    assert result["intercept"] == pytest.approx(intercept)
+
+
+def test_fit_simple_linear_regression_empty():
+    """Test closed-form regression with empty data."""
+    result = fit_simple_linear_regression(np.array([]), np.array([]))
+    assert result["n_samples"] == 0
+    assert result["r2"] is None
+
+
+def test_fit_simple_linear_regression_matches_general_fit():
+    """Test closed-form regression agrees with the general fit on noisy data."""
+    rng = np.random.default_rng(0)
+    x = rng.uniform(1e5, 3e7, size=50)
+    y = 0.3 * x + rng.normal(0, 1e6, size=50)
+    simple = fit_simple_linear_regression(x, y)
+    general = fit_linear_regression(x.reshape(-1, 1), y)
+    assert simple["n_samples"] == general["n_samples"]
+    for key in ("r2", "mae", "rmse", "intercept"):
+        assert simple[key] == pytest.approx(general[key])
+    assert simple["coef"] == pytest.approx(general["coef"])